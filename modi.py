@@ -10,13 +10,29 @@ import re
 import csv
 import json
 import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, field, asdict
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from dataclasses import dataclass, field, fields
+from functools import partial
+from operator import attrgetter
 import argparse
 import os
 from pathlib import Path
 
+try:
+    import orjson  # optional, faster JSON encoding
+except ImportError:
+    orjson = None
+
+from parsers import (
+    LINE_RE, split_fields, decode_reg_state, parse_lte_serving,
+    parse_nr5g_sa_serving, parse_nr5g_nsa_serving, parse_wcdma_serving
+)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -24,11 +40,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@dataclass
+def _dumps_json(obj) -> str:
+    """Serialize to compact JSON; orjson and stdlib json give identical output"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+def _format_timestamp(timestamp_ns: int) -> str:
+    """Format a time.time_ns() value as local 'YYYY-MM-DD HH:MM:SS.mmm'"""
+    # Integer arithmetic throughout: going through a float rounds up to the next ms
+    seconds, nanoseconds = divmod(timestamp_ns, 1_000_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=nanoseconds // 1000).isoformat(
+        sep=' ', timespec='milliseconds')
+
+@dataclass(slots=True)
 class NetworkData:
     """Comprehensive network data structure for ML IDS"""
     # Timestamp
-    timestamp: str = ""
+    timestamp: int = 0  # time.time_ns(), formatted by _format_timestamp on output
     
     # RRC Layer Data
     rrc_state: str = ""  # IDLE, CONNECTED, INACTIVE
@@ -98,15 +127,42 @@ class NetworkData:
     battery_voltage: str = ""  # Battery voltage
     power_consumption: str = ""  # Current power consumption
 
+# CSV columns, in NetworkData field order
+_FIELDNAMES: Tuple[str, ...] = tuple(f.name for f in fields(NetworkData))
+
+# Row values read straight off a NetworkData in _FIELDNAMES order
+_row_values = attrgetter(*_FIELDNAMES)
+
 class ATCommandInterface:
     """Handles AT command communication with the modem"""
     
+    # Unsolicited registration updates enabled by NetworkMonitor._configure_modem
+    URC_PREFIXES = ('+CREG:', '+CGREG:', '+CEREG:', '+C5GREG:')
+    
+    # send_chained back-off: plain ERRORs in a row before a command is skipped,
+    # and the number of calls it is skipped for before being re-probed
+    MAX_ERRORS = 3
+    RETRY_INTERVAL = 20
+    
     def __init__(self, port: str, baudrate: int = 115200, timeout: int = 5):
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
         self.serial_conn = None
         
+        # URCs received between commands, oldest first
+        self.urcs: Deque[str] = deque(maxlen=64)
+        # Incomplete last line left by _drain_input, completed by the next read
+        self._rx_tail = b''
+        
+        # Chained-command failures, backed off rather than given up on (see send_chained)
+        self.unchainable_commands: Set[str] = set()
+        self._error_counts: Dict[str, int] = {}
+        self._retry_at: Dict[str, int] = {}
+        self._chained_calls = 0
+        self.chaining_supported = True
+        self._chain_retry_at = 0
+        
     def connect(self) -> bool:
         """Establish serial connection"""
         try:
@@ -148,28 +204,39 @@ class ATCommandInterface:
         timeout = timeout or self.timeout
         
         try:
-            # Clear buffers
-            self.serial_conn.reset_input_buffer()
-            self.serial_conn.reset_output_buffer()
+            # Set aside anything the modem sent since the last command
+            self._drain_input()
             
             # Send command
             cmd = f"{command}\r\n"
             self.serial_conn.write(cmd.encode())
             logger.debug(f"Sent: {command}")
             
-            # Read response
+            # Read response: readline() blocks until a full line arrives or the
+            # port timeout expires, so we return as soon as the terminator is seen
+            if self.serial_conn.timeout != timeout:
+                self.serial_conn.timeout = timeout
             response_lines = []
-            start_time = time.time()
-            
-            while time.time() - start_time < timeout:
-                if self.serial_conn.in_waiting > 0:
-                    line = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                    if line:
-                        response_lines.append(line)
-                        if line in ['OK', 'ERROR'] or line.startswith('+CME ERROR'):
-                            break
-                time.sleep(0.05)
-            
+            deadline = time.monotonic() + timeout
+
+            while True:
+                if time.monotonic() >= deadline:
+                    # Lines (e.g. URCs) kept coming but no final result code
+                    logger.warning(f"Timed out waiting for response to {command}")
+                    break
+                raw = self._readline()
+                if not raw:
+                    # Timed out waiting for the next line
+                    break
+                line = raw.decode('utf-8', errors='ignore').strip()
+                if self._is_registration_urc(line):
+                    # Arrived mid-response; keep it out of the query reply
+                    self.urcs.append(line)
+                elif line:
+                    response_lines.append(line)
+                    if line in ['OK', 'ERROR'] or line.startswith('+CME ERROR'):
+                        break
+
             logger.debug(f"Response: {response_lines}")
             return response_lines
             
@@ -177,319 +244,369 @@ class ATCommandInterface:
             logger.error(f"Error sending command {command}: {e}")
             return []
     
+    def read_unsolicited(self) -> List[str]:
+        """Return URCs received since the last call"""
+        if self.serial_conn and self.serial_conn.is_open:
+            try:
+                self._drain_input()
+            except Exception as e:
+                logger.error(f"Error reading unsolicited data: {e}")
+        
+        urcs = list(self.urcs)
+        self.urcs.clear()
+        return urcs
+    
+    def _drain_input(self):
+        """Consume pending input, keeping URCs and dropping stale response lines
+
+        Only the bytes already buffered are read, so a line the modem is still
+        sending doesn't block; its start is kept for the next read.
+        """
+        waiting = self.serial_conn.in_waiting
+        if not waiting:
+            return
+        *lines, self._rx_tail = (self._rx_tail + self.serial_conn.read(waiting)).split(b'\n')
+        for raw in lines:
+            line = raw.decode('utf-8', errors='ignore').strip()
+            if self._is_registration_urc(line):
+                self.urcs.append(line)
+            elif line:
+                logger.debug(f"Discarded unsolicited line: {line}")
+    
+    def _readline(self) -> bytes:
+        """Read a line from the port, completing any tail left by _drain_input"""
+        raw = self.serial_conn.readline()
+        if self._rx_tail:
+            raw, self._rx_tail = self._rx_tail + raw, b''
+        return raw
+    
+    def _is_registration_urc(self, line: str) -> bool:
+        """Tell a registration URC from a query reply with the same prefix
+
+        Query replies lead with an unquoted <n>,<stat>; URCs start at <stat>,
+        so they have a single field or a quoted LAC/TAC as the second one.
+        """
+        if not line.startswith(self.URC_PREFIXES):
+            return False
+        parts = line.split(':', 1)[1].split(',')
+        return len(parts) < 2 or parts[1].strip().startswith('"')
+    
+    def send_chained(self, commands: List[str], timeout: Optional[int] = None) -> List[str]:
+        """Send several AT commands as one chained command line and return all response lines
+
+        Commands the modem rejects are remembered so later calls don't pay for
+        a failed chain plus a fallback every time. The modem also answers ERROR
+        while busy or searching for service, so this is a back-off: a failing
+        command gets its own round-trip until it succeeds again, and after
+        MAX_ERRORS plain ERRORs in a row it is skipped for RETRY_INTERVAL calls
+        before being re-probed. If the chain fails while every command succeeds
+        on its own (chaining rejected, line too long), commands are sent one at
+        a time and chaining is retried every RETRY_INTERVAL calls.
+        """
+        self._chained_calls += 1
+        commands = [cmd for cmd in commands if self._retry_at.get(cmd, 0) <= self._chained_calls]
+        if not self.chaining_supported and self._chained_calls >= self._chain_retry_at:
+            self.chaining_supported = True
+        chainable = [cmd for cmd in commands if cmd not in self.unchainable_commands] \
+            if self.chaining_supported else []
+        
+        response_lines = []
+        if chainable:
+            chained = "AT" + ";".join(cmd.removeprefix("AT") for cmd in chainable)
+            response = self.send_command(chained, timeout)
+            if self._check_ok(response):
+                response_lines.extend(response)
+            else:
+                # The modem aborts a chain at the first failing command, so fall
+                # back to one round-trip per command and find the culprit
+                logger.debug(f"Chained command failed, sending individually: {response}")
+                all_ok = True
+                for command in chainable:
+                    response = self._send_isolated(command, timeout)
+                    all_ok = all_ok and self._check_ok(response)
+                    response_lines.extend(response)
+                if all_ok:
+                    # Only the first time is news; later re-probes failing too isn't
+                    log = logger.debug if self._chain_retry_at else logger.info
+                    log("Modem rejected the chained command, sending commands one at a time")
+                    self.chaining_supported = False
+                    self._chain_retry_at = self._chained_calls + self.RETRY_INTERVAL
+        
+        for command in commands:
+            if command not in chainable:
+                response_lines.extend(self._send_isolated(command, timeout))
+        return response_lines
+    
+    def _send_isolated(self, command: str, timeout: Optional[int]) -> List[str]:
+        """Send one command in its own round-trip and update its back-off state"""
+        response = self.send_command(command, timeout)
+        if self._check_ok(response):
+            if command in self.unchainable_commands:
+                logger.info(f"{command} succeeded again, moving it back into the chain")
+            self.unchainable_commands.discard(command)
+            self._error_counts.pop(command, None)
+            self._retry_at.pop(command, None)
+        elif response and (response[-1] == 'ERROR' or response[-1].startswith('+CME ERROR')):
+            if command not in self.unchainable_commands:
+                self.unchainable_commands.add(command)
+                logger.info(f"{command} failed ({response[-1]}), sending it outside the chain")
+            if response[-1] == 'ERROR':
+                errors = self._error_counts[command] = self._error_counts.get(command, 0) + 1
+                if errors >= self.MAX_ERRORS:
+                    self._retry_at[command] = self._chained_calls + self.RETRY_INTERVAL
+                    # Only the first back-off is news; later re-probes failing too isn't
+                    log = logger.info if errors == self.MAX_ERRORS else logger.debug
+                    log(f"{command} returned ERROR {errors} times in a row, "
+                        f"skipping it for {self.RETRY_INTERVAL} samples")
+        return response
+    
     def _check_ok(self, response: List[str]) -> bool:
-        """Check if response contains OK"""
-        return any('OK' in line for line in response)
+        """Check if response ended with OK"""
+        # send_command stops reading at the final result code, so it is always last
+        return bool(response) and response[-1] == 'OK'
 
 class NetworkDataExtractor:
     """Extracts network data from AT command responses"""
     
+    # Queries sent as a single chained command every sample
+    SAMPLE_COMMANDS = [
+        'AT+QENG="servingcell"',
+        'AT+QENG="neighbourcell"',
+        "AT+CREG?",
+        "AT+CGREG?",
+        "AT+CEREG?",
+        "AT+C5GREG?",
+        "AT+CPIN?",
+        "AT+COPS?",
+        "AT+CGATT?",
+        "AT+CSQ",
+        "AT+QCAINFO",
+    ]
+    
+    # Registration queries that a pending URC can stand in for
+    REGISTRATION_COMMANDS = {
+        'CREG': "AT+CREG?",
+        'CGREG': "AT+CGREG?",
+        'CEREG': "AT+CEREG?",
+        'C5GREG': "AT+C5GREG?",
+    }
+    
     def __init__(self, at_interface: ATCommandInterface):
         self.at = at_interface
         
-    def extract_all_data(self) -> NetworkData:
-        """Extract comprehensive network data"""
-        data = NetworkData()
-        data.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        
-        # Extract serving cell info (includes RRC state)
-        self._extract_serving_cell(data)
-        
-        # Extract NAS registration states
-        self._extract_nas_states(data)
+        # Response prefix (see parsers.LINE_RE) -> line parser
+        self._dispatch = {
+            'QENG': self._parse_qeng,
+            'CREG': partial(self._parse_registration, ('cs_state', 'cs_lac', 'cs_ci')),
+            'CGREG': partial(self._parse_registration, ('ps_state', 'ps_lac', 'ps_ci')),
+            'CEREG': partial(self._parse_registration, ('eps_state', 'eps_tac', 'eps_ci')),
+            'C5GREG': partial(self._parse_registration, ('nr5g_state', 'nr5g_tac', 'nr5g_ci')),
+            'CPIN': self._parse_sim_state,
+            'COPS': self._parse_operator,
+            'CGATT': self._parse_attach_state,
+            'CSQ': self._parse_csq,
+            'QCAINFO': self._parse_ca_info,
+        }
         
-        # Extract authentication/security info
-        self._extract_auth_info(data)
+        # Parses responses while the calling thread keeps the serial port busy
+        self._parse_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="at-parser")
         
-        # Extract neighbor cells
-        self._extract_neighbor_cells(data)
+        # Per-sample accumulators, reset by _parse_response
+        self._neighbor_cells: List[Dict[str, str]] = []
+        self._neighbor_rsrp: List[str] = []
+        self._ca_info: List[str] = []
         
-        # Extract additional signal metrics
-        self._extract_signal_metrics(data)
+    def extract_all_data(self) -> NetworkData:
+        """Extract comprehensive network data"""
+        data = NetworkData()
+        data.timestamp = time.time_ns()
+        
+        # A registration URC received since the last sample already holds the
+        # current state for that domain, so its query can be left out
+        commands = self.SAMPLE_COMMANDS
+        urc_states = self._pending_registration_urcs()
+        if urc_states:
+            skipped = {self.REGISTRATION_COMMANDS[name] for name in urc_states}
+            commands = [cmd for cmd in commands if cmd not in skipped]
+            for name, body in urc_states.items():
+                self._dispatch[name](body, data, stat_index=0)
+        
+        # Query everything else in one round-trip
+        lines = self.at.send_chained(commands)
+        
+        # Extract serving cell (incl. RRC state), NAS, authentication,
+        # neighbor cell and signal data in a single pass over the response.
+        # This runs on the parser thread while the diagnostic queries below
+        # wait on the modem; the two touch disjoint NetworkData fields.
+        parsed = self._parse_pool.submit(self._parse_response, lines, data)
         
         # Extract diagnostic information via AT commands
         self._extract_diagnostic_info(data)
         
+        parsed.result()
         return data
     
-    def _extract_serving_cell(self, data: NetworkData):
-        """Extract serving cell and RRC information"""
-        lines = self.at.send_command('AT+QENG="servingcell"')
-        
-        for line in lines:
-            if line.startswith('+QENG: "servingcell"'):
-                parts = line.split(',')
-                if len(parts) >= 3:
-                    # Common fields
-                    data.rrc_state = parts[1].strip('"')
-                    data.technology = parts[2].strip('"')
-                    data.cell_type = "serving"
-                    
-                    # Technology-specific parsing
-                    if "LTE" in data.technology:
-                        self._parse_lte_serving(parts, data)
-                    elif "NR5G-SA" in data.technology:
-                        self._parse_nr5g_sa_serving(parts, data)
-                    elif "NR5G-NSA" in data.technology:
-                        self._parse_nr5g_nsa_serving(parts, data)
-                    elif "WCDMA" in data.technology:
-                        self._parse_wcdma_serving(parts, data)
-                        
-            elif line.startswith('+QENG: "LTE"') or line.startswith('+QENG: "NR5G-NSA"'):
-                # EN-DC mode additional cells
-                data.serving_cell_count += 1
-                
-    def _parse_lte_serving(self, parts: List[str], data: NetworkData):
-        """Parse LTE serving cell data"""
-        try:
-            if len(parts) >= 18:
-                idx_offset = 1 if parts[0].startswith('+QENG: "LTE"') else 0
-                data.mcc = parts[3 + idx_offset].strip('"')
-                data.mnc = parts[4 + idx_offset].strip('"')
-                data.cell_id = parts[5 + idx_offset].strip('"')
-                data.pci = parts[6 + idx_offset].strip('"')
-                data.earfcn_arfcn = parts[7 + idx_offset].strip('"')
-                data.band = parts[8 + idx_offset].strip('"')
-                data.bandwidth = parts[9 + idx_offset].strip('"') if len(parts) > 9 + idx_offset else ""
-                data.tac_lac = parts[11 + idx_offset].strip('"')
-                data.rsrp = parts[12 + idx_offset].strip('"')
-                data.rsrq = parts[13 + idx_offset].strip('"')
-                data.rssi = parts[14 + idx_offset].strip('"')
-                data.sinr = parts[15 + idx_offset].strip('"')
-                data.cqi = parts[16 + idx_offset].strip('"') if len(parts) > 16 + idx_offset else ""
-                data.tx_power = parts[17 + idx_offset].strip('"') if len(parts) > 17 + idx_offset else ""
-        except (IndexError, ValueError) as e:
-            logger.warning(f"Error parsing LTE serving cell: {e}")
-    
-    def _parse_nr5g_sa_serving(self, parts: List[str], data: NetworkData):
-        """Parse NR5G-SA serving cell data"""
-        try:
-            if len(parts) >= 17:
-                data.mcc = parts[4].strip('"')
-                data.mnc = parts[5].strip('"')
-                data.cell_id = parts[6].strip('"')
-                data.pci = parts[7].strip('"')
-                data.tac_lac = parts[8].strip('"')
-                data.earfcn_arfcn = parts[9].strip('"')
-                data.band = parts[10].strip('"')
-                data.bandwidth = parts[11].strip('"') if len(parts) > 11 else ""
-                data.rsrp = parts[12].strip('"')
-                data.rsrq = parts[13].strip('"')
-                data.sinr = parts[14].strip('"')
-                data.rssi = parts[15].strip('"') if len(parts) > 15 else ""
-                data.tx_power = parts[16].strip('"') if len(parts) > 16 else ""
-        except (IndexError, ValueError) as e:
-            logger.warning(f"Error parsing NR5G-SA serving cell: {e}")
-    
-    def _parse_nr5g_nsa_serving(self, parts: List[str], data: NetworkData):
-        """Parse NR5G-NSA serving cell data"""
-        try:
-            if len(parts) >= 11:
-                data.mcc = parts[1].strip('"')
-                data.mnc = parts[2].strip('"')
-                data.pci = parts[3].strip('"')
-                data.rsrp = parts[4].strip('"')
-                data.sinr = parts[5].strip('"')
-                data.rsrq = parts[6].strip('"')
-                data.earfcn_arfcn = parts[7].strip('"')
-                data.band = parts[8].strip('"')
-                data.bandwidth = parts[9].strip('"') if len(parts) > 9 else ""
-                data.scs = parts[10].strip('"') if len(parts) > 10 else ""
-        except (IndexError, ValueError) as e:
-            logger.warning(f"Error parsing NR5G-NSA serving cell: {e}")
-    
-    def _parse_wcdma_serving(self, parts: List[str], data: NetworkData):
-        """Parse WCDMA serving cell data"""
-        try:
-            if len(parts) >= 17:
-                data.mcc = parts[4].strip('"')
-                data.mnc = parts[5].strip('"')
-                data.tac_lac = parts[6].strip('"')
-                data.cell_id = parts[7].strip('"')
-                data.earfcn_arfcn = parts[8].strip('"')
-                data.pci = parts[9].strip('"')  # PSC for WCDMA
-                data.rsrp = parts[11].strip('"')  # RSCP for WCDMA
-                data.rsrq = parts[12].strip('"')  # ECIO for WCDMA
-        except (IndexError, ValueError) as e:
-            logger.warning(f"Error parsing WCDMA serving cell: {e}")
-    
-    def _extract_nas_states(self, data: NetworkData):
-        """Extract NAS registration states"""
-        # Circuit Switched registration
-        lines = self.at.send_command("AT+CREG?")
-        for line in lines:
-            if line.startswith('+CREG:'):
-                parts = line.split(',')
-                if len(parts) >= 2:
-                    data.cs_state = self._decode_reg_state(parts[1].strip())
-                    if len(parts) >= 4:
-                        data.cs_lac = parts[2].strip('"')
-                        data.cs_ci = parts[3].strip('"')
-        
-        # Packet Switched registration (GPRS)
-        lines = self.at.send_command("AT+CGREG?")
-        for line in lines:
-            if line.startswith('+CGREG:'):
-                parts = line.split(',')
-                if len(parts) >= 2:
-                    data.ps_state = self._decode_reg_state(parts[1].strip())
-                    if len(parts) >= 4:
-                        data.ps_lac = parts[2].strip('"')
-                        data.ps_ci = parts[3].strip('"')
-        
-        # EPS registration (LTE)
-        lines = self.at.send_command("AT+CEREG?")
-        for line in lines:
-            if line.startswith('+CEREG:'):
-                parts = line.split(',')
-                if len(parts) >= 2:
-                    data.eps_state = self._decode_reg_state(parts[1].strip())
-                    if len(parts) >= 4:
-                        data.eps_tac = parts[2].strip('"')
-                        data.eps_ci = parts[3].strip('"')
-        
-        # 5G registration
-        lines = self.at.send_command("AT+C5GREG?")
-        for line in lines:
-            if line.startswith('+C5GREG:'):
-                parts = line.split(',')
-                if len(parts) >= 2:
-                    data.nr5g_state = self._decode_reg_state(parts[1].strip())
-                    if len(parts) >= 4:
-                        data.nr5g_tac = parts[2].strip('"')
-                        data.nr5g_ci = parts[3].strip('"')
-    
-    def _decode_reg_state(self, state: str) -> str:
-        """Decode registration state"""
-        states = {
-            '0': 'NOT_REGISTERED',
-            '1': 'REGISTERED_HOME',
-            '2': 'SEARCHING',
-            '3': 'DENIED',
-            '4': 'UNKNOWN',
-            '5': 'REGISTERED_ROAMING',
-            '6': 'REGISTERED_SMS_ONLY_HOME',
-            '7': 'REGISTERED_SMS_ONLY_ROAMING',
-            '8': 'EMERGENCY_ONLY',
-            '9': 'REGISTERED_CSFB_NOT_PREFERRED_HOME',
-            '10': 'REGISTERED_CSFB_NOT_PREFERRED_ROAMING'
-        }
-        return states.get(state, f'UNKNOWN_{state}')
-    
-    def _extract_auth_info(self, data: NetworkData):
-        """Extract authentication and security information"""
-        # SIM state
-        lines = self.at.send_command("AT+CPIN?")
-        for line in lines:
-            if line.startswith('+CPIN:'):
-                data.sim_state = line.split(':', 1)[1].strip()
-        
-        # Operator info
-        lines = self.at.send_command("AT+COPS?")
-        for line in lines:
-            if line.startswith('+COPS:'):
-                parts = line.split(',')
-                if len(parts) >= 3:
-                    data.operator = parts[2].strip('"')
-                    if len(parts) >= 4:
-                        data.operator_mcc_mnc = parts[3].strip('"')
-        
-        # Attach state
-        lines = self.at.send_command("AT+CGATT?")
-        for line in lines:
-            if line.startswith('+CGATT:'):
-                state = line.split(':', 1)[1].strip()
-                data.attach_state = "ATTACHED" if state == '1' else "DETACHED"
-    
-    def _extract_neighbor_cells(self, data: NetworkData):
-        """Extract neighbor cell information"""
-        lines = self.at.send_command('AT+QENG="neighbourcell"')
-        neighbor_cells = []
+    def close(self):
+        """Stop the parser thread"""
+        self._parse_pool.shutdown(wait=True)
+    
+    def _pending_registration_urcs(self) -> Dict[str, str]:
+        """Latest registration URC payload per command name"""
+        urc_states = {}
+        for line in self.at.read_unsolicited():
+            match = LINE_RE.match(line)
+            if match and match.group(1) in self.REGISTRATION_COMMANDS:
+                urc_states[match.group(1)] = match.group(2)
+        return urc_states
+    
+    def _parse_response(self, lines: List[str], data: NetworkData):
+        """Dispatch each response line to the parser for its prefix"""
+        self._neighbor_cells = []
+        self._neighbor_rsrp = []
+        self._ca_info = []
         
         for line in lines:
-            if '+QENG: "neighbourcell' in line:
-                parts = line.split(',')
-                cell_info = {}
+            match = LINE_RE.match(line)
+            if match:
+                self._dispatch[match.group(1)](match.group(2), data)
+        
+        self._summarize_neighbor_cells(data)
+        data.ca_info = '; '.join(self._ca_info) if self._ca_info else ""
+    
+    def _parse_qeng(self, body: str, data: NetworkData):
+        """Parse a +QENG serving cell or neighbour cell line"""
+        parts = split_fields(body)
+        kind = parts[0]
+        
+        if kind == 'servingcell':
+            if len(parts) >= 3:
+                # Common fields
+                data.rrc_state = parts[1]
+                data.technology = parts[2]
+                data.cell_type = "serving"
                 
-                if 'LTE' in line:
-                    try:
-                        cell_info = {
-                            'tech': 'LTE',
-                            'earfcn': parts[2].strip('"'),
-                            'pci': parts[3].strip('"'),
-                            'rsrq': parts[4].strip('"'),
-                            'rsrp': parts[5].strip('"'),
-                            'rssi': parts[6].strip('"'),
-                            'sinr': parts[7].strip('"'),
-                            'srxlev': parts[8].strip('"') if len(parts) > 8 else ""
-                        }
-                    except (IndexError, ValueError):
-                        pass
-                elif 'WCDMA' in line:
-                    try:
-                        cell_info = {
-                            'tech': 'WCDMA',
-                            'uarfcn': parts[2].strip('"'),
-                            'psc': parts[5].strip('"'),
-                            'rscp': parts[6].strip('"'),
-                            'ecio': parts[7].strip('"'),
-                            'srxlev': parts[8].strip('"') if len(parts) > 8 else ""
-                        }
-                    except (IndexError, ValueError):
-                        pass
-                elif '5G' in line:
-                    try:
-                        cell_info = {
-                            'tech': '5G',
-                            'arfcn': parts[2].strip('"'),
-                            'pci': parts[3].strip('"'),
-                            'rsrp': parts[4].strip('"'),
-                            'rsrq': parts[5].strip('"'),
-                            'sinr': parts[6].strip('"') if len(parts) > 6 else ""
-                        }
-                    except (IndexError, ValueError):
-                        pass
+                # Technology-specific parsing
+                if "LTE" in data.technology:
+                    parse_lte_serving(parts, data)
+                elif "NR5G-SA" in data.technology:
+                    parse_nr5g_sa_serving(parts, data)
+                elif "NR5G-NSA" in data.technology:
+                    parse_nr5g_nsa_serving(parts, data)
+                elif "WCDMA" in data.technology:
+                    parse_wcdma_serving(parts, data)
+                    
+        elif kind.startswith('neighbourcell'):
+            self._parse_neighbor_cell(body, parts)
+            
+        elif kind in ('LTE', 'NR5G-NSA'):
+            # EN-DC mode additional cells
+            data.serving_cell_count += 1
                 
-                if cell_info:
-                    neighbor_cells.append(cell_info)
-        
+    def _parse_registration(self, fields: Tuple[str, str, str], body: str, data: NetworkData,
+                            stat_index: int = 1):
+        """Parse a +CREG/+CGREG/+CEREG/+C5GREG registration line into the given fields
+
+        Query responses lead with <n> before <stat>; URCs start at <stat> (stat_index=0).
+        """
+        parts = split_fields(body)
+        if len(parts) > stat_index:
+            state_field, area_field, ci_field = fields
+            setattr(data, state_field, decode_reg_state(parts[stat_index].strip()))
+            if len(parts) > stat_index + 2:
+                setattr(data, area_field, parts[stat_index + 1])
+                setattr(data, ci_field, parts[stat_index + 2])
+    
+    def _parse_sim_state(self, body: str, data: NetworkData):
+        """Parse +CPIN SIM state"""
+        data.sim_state = body.strip()
+    
+    def _parse_operator(self, body: str, data: NetworkData):
+        """Parse +COPS operator info"""
+        parts = split_fields(body)
+        if len(parts) >= 3:
+            data.operator = parts[2]
+            if len(parts) >= 4:
+                data.operator_mcc_mnc = parts[3]
+    
+    def _parse_attach_state(self, body: str, data: NetworkData):
+        """Parse +CGATT attach state"""
+        data.attach_state = "ATTACHED" if body.strip() == '1' else "DETACHED"
+    
+    def _parse_neighbor_cell(self, body: str, parts: List[str]):
+        """Parse a neighbour cell line into the per-sample neighbor list"""
+        cell_info = {}
+        
+        if 'LTE' in body:
+            try:
+                cell_info = {
+                    'tech': 'LTE',
+                    'earfcn': parts[2],
+                    'pci': parts[3],
+                    'rsrq': parts[4],
+                    'rsrp': parts[5],
+                    'rssi': parts[6],
+                    'sinr': parts[7],
+                    'srxlev': parts[8] if len(parts) > 8 else ""
+                }
+            except (IndexError, ValueError):
+                pass
+        elif 'WCDMA' in body:
+            try:
+                cell_info = {
+                    'tech': 'WCDMA',
+                    'uarfcn': parts[2],
+                    'psc': parts[5],
+                    'rscp': parts[6],
+                    'ecio': parts[7],
+                    'srxlev': parts[8] if len(parts) > 8 else ""
+                }
+            except (IndexError, ValueError):
+                pass
+        elif '5G' in body:
+            try:
+                cell_info = {
+                    'tech': '5G',
+                    'arfcn': parts[2],
+                    'pci': parts[3],
+                    'rsrp': parts[4],
+                    'rsrq': parts[5],
+                    'sinr': parts[6] if len(parts) > 6 else ""
+                }
+            except (IndexError, ValueError):
+                pass
+        
+        if cell_info:
+            self._neighbor_cells.append(cell_info)
+            self._neighbor_rsrp.append(cell_info.get('rsrp', cell_info.get('rscp', '')))
+    
+    def _summarize_neighbor_cells(self, data: NetworkData):
+        """Fill neighbor cell count, best RSRP and JSON from the collected cells"""
+        neighbor_cells = self._neighbor_cells
         data.neighbor_count = len(neighbor_cells)
         
-        # Find best neighbor RSRP
-        if neighbor_cells:
-            rsrp_values = []
-            for cell in neighbor_cells:
-                rsrp = cell.get('rsrp', cell.get('rscp', ''))
-                if rsrp and rsrp != 'N/A':
-                    try:
-                        rsrp_values.append(int(rsrp))
-                    except ValueError:
-                        pass
-            
-            if rsrp_values:
-                data.best_neighbor_rsrp = str(max(rsrp_values))
+        # Find best neighbor RSRP (RSCP for WCDMA), skipping 'N/A', blanks and garbage
+        rsrp_values = []
+        for rsrp in self._neighbor_rsrp:
+            try:
+                rsrp_values.append(int(rsrp))
+            except ValueError:
+                pass
+        if rsrp_values:
+            data.best_neighbor_rsrp = str(max(rsrp_values))
         
         # Store neighbor cells as JSON
-        data.neighbor_cells_json = json.dumps(neighbor_cells) if neighbor_cells else ""
-    
-    def _extract_signal_metrics(self, data: NetworkData):
-        """Extract additional signal metrics"""
-        # CSQ
-        lines = self.at.send_command("AT+CSQ")
-        for line in lines:
-            if line.startswith('+CSQ:'):
-                parts = line.split(':', 1)[1].strip().split(',')
-                if len(parts) >= 2:
-                    data.csq_rssi = parts[0].strip()
-                    data.csq_ber = parts[1].strip()
-        
-        # Carrier aggregation info
-        lines = self.at.send_command("AT+QCAINFO")
-        ca_info = []
-        for line in lines:
-            if line.startswith('+QCAINFO:'):
-                ca_info.append(line.split(':', 1)[1].strip())
-        data.ca_info = '; '.join(ca_info) if ca_info else ""
+        data.neighbor_cells_json = _dumps_json(neighbor_cells) if neighbor_cells else ""
+    
+    def _parse_csq(self, body: str, data: NetworkData):
+        """Parse +CSQ signal quality"""
+        parts = split_fields(body)
+        if len(parts) >= 2:
+            data.csq_rssi = parts[0].strip()
+            data.csq_ber = parts[1].strip()
+    
+    def _parse_ca_info(self, body: str, data: NetworkData):
+        """Collect a +QCAINFO carrier aggregation line"""
+        self._ca_info.append(body)
 
     def _extract_diagnostic_info(self, data: NetworkData):
         """Extract diagnostic information using AT commands"""
@@ -548,9 +665,24 @@ class NetworkDataExtractor:
         # This is already captured in _extract_serving_cell via tx_power field
 
 class DataLogger:
-    """Handles CSV logging of network data"""
+    """Handles CSV logging of network data
+
+    Rows are flushed to the OS every flush_every rows (FLUSH_EVERY env var,
+    default 16) or FLUSH_INTERVAL seconds, whichever comes first. Fewer flushes
+    mean fewer writes on SD cards, at the cost of losing up to that many rows
+    if the process dies; close() always flushes what is left.
+    """
+    
+    # Most rows written per writerows() call by the writer thread
+    BATCH_SIZE = 64
+    
+    # Longest time, in seconds, written rows may sit unflushed
+    FLUSH_INTERVAL = 5.0
     
-    def __init__(self, output_dir: str = "network_data"):
+    # Queued by close() to stop the writer thread
+    _STOP = object()
+    
+    def __init__(self, output_dir: str = "network_data", flush_every: Optional[int] = None):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
@@ -562,18 +694,31 @@ class DataLogger:
         self.csv_writer = None
         self.is_initialized = False
         
+        # Flush the CSV file after this many rows (or FLUSH_INTERVAL seconds)
+        if flush_every is None:
+            flush_every = int(os.environ.get('FLUSH_EVERY', 16))
+        self.flush_every = max(1, flush_every)
+        self._rows_since_flush = 0
+        self._last_flush = time.monotonic()
+        
+        # Rows waiting for the writer thread, so disk latency stays off the sampling loop
+        self._queue: queue.Queue = queue.Queue(maxsize=1024)
+        self._writer_thread = None
+        
     def initialize(self):
         """Initialize CSV file with headers"""
         try:
             self.csv_file = open(self.filename, 'w', newline='', encoding='utf-8')
             
-            # Get field names from NetworkData
-            fieldnames = [field.name for field in NetworkData.__dataclass_fields__.values()]
-            
-            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=fieldnames)
-            self.csv_writer.writeheader()
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(_FIELDNAMES)
             self.csv_file.flush()
             
+            self._writer_thread = threading.Thread(
+                target=self._write_rows, name="csv-writer", daemon=True
+            )
+            self._writer_thread.start()
+            
             self.is_initialized = True
             logger.info(f"Logging to: {self.filename}")
             
@@ -586,22 +731,74 @@ class DataLogger:
         if not self.is_initialized:
             self.initialize()
         
-        if self.is_initialized and self.csv_writer and self.csv_file:
+        if self.is_initialized and self._writer_thread:
             try:
-                # Convert dataclass to dict
-                data_dict = asdict(data)
+                # Hand the row to the writer thread
+                self._queue.put_nowait(_row_values(data))
+            except queue.Full:
+                logger.error("CSV writer is falling behind, dropping sample")
+    
+    def _write_rows(self):
+        """Writer thread: write queued rows in batches until close()"""
+        stopping = False
+        while not stopping:
+            try:
+                row = self._queue.get(timeout=self.FLUSH_INTERVAL)
+            except queue.Empty:
+                # Idle: don't leave written rows unflushed indefinitely
+                self._flush()
+                continue
+            if row is self._STOP:
+                break
+            
+            # Take whatever else is already queued along with it
+            batch = [row]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    row = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is self._STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            
+            try:
+                # Timestamps are formatted here, off the sampling loop;
+                # timestamp is the first column
+                self.csv_writer.writerows(
+                    (_format_timestamp(row[0]),) + row[1:] for row in batch
+                )
                 
-                # Write row
-                self.csv_writer.writerow(data_dict)
-                self.csv_file.flush()
+                self._rows_since_flush += len(batch)
+                if (self._rows_since_flush >= self.flush_every or
+                        time.monotonic() - self._last_flush > self.FLUSH_INTERVAL):
+                    self._flush()
                 
-                logger.debug("Data logged to CSV")
+                logger.debug(f"Logged {len(batch)} row(s) to CSV")
                 
             except Exception as e:
                 logger.error(f"Failed to log data: {e}")
+        
+        self._flush()
+    
+    def _flush(self):
+        """Flush rows written since the last flush"""
+        if self._rows_since_flush:
+            try:
+                self.csv_file.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush CSV file: {e}")
+            self._rows_since_flush = 0
+        self._last_flush = time.monotonic()
     
     def close(self):
-        """Close CSV file"""
+        """Write out queued rows and close CSV file"""
+        if self._writer_thread:
+            self._queue.put(self._STOP)
+            self._writer_thread.join()
+            self._writer_thread = None
+        
         if self.csv_file:
             self.csv_file.close()
             logger.info("CSV logger closed")
@@ -640,6 +837,7 @@ class NetworkMonitor:
         logger.info(f"Using AT port: {self.port}")
         
         try:
+            next_sample = time.monotonic()
             while self.running:
                 # Extract data
                 data = self.extractor.extract_all_data()
@@ -650,8 +848,15 @@ class NetworkMonitor:
                 # Display summary
                 self._display_summary(data)
                 
-                # Wait for next interval
-                time.sleep(self.interval)
+                # Wait for next interval, counted from the start of this sample
+                # so the time spent above doesn't drift the sampling grid
+                next_sample += self.interval
+                delay = next_sample - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Fell behind (e.g. modem timeouts); restart the grid from now
+                    next_sample = time.monotonic()
                 
         except KeyboardInterrupt:
             logger.info("Monitoring stopped by user")
@@ -665,6 +870,7 @@ class NetworkMonitor:
     def stop(self):
         """Stop monitoring"""
         self.running = False
+        self.extractor.close()
         self.logger.close()
         self.at_interface.disconnect()
         logger.info("Network monitoring stopped")
@@ -685,7 +891,7 @@ class NetworkMonitor:
     def _display_summary(self, data: NetworkData):
         """Display summary of current network state"""
         print("\n" + "="*80)
-        print(f"Network Status - {data.timestamp}")
+        print(f"Network Status - {_format_timestamp(data.timestamp)}")
         print("="*80)
         
         # RRC/Cell Info
@@ -0,0 +1,161 @@
+# cython: language_level=3
+"""
+AT response parsers for the Quectel RM520N-GL network data extractor
+
+Plain Python so it runs anywhere, and can be compiled in place with Cython
+(`cythonize -i parsers.py`). A compiled module is picked up by
+`import parsers` ahead of this file; delete it to fall back. The LTE parsers
+generated at runtime are regular Python functions either way.
+
+Parsers fill the fields of a modi.NetworkData instance passed in as `data`.
+"""
+
+import re
+import logging
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Response lines parsed by NetworkDataExtractor, split into (prefix, payload)
+LINE_RE = re.compile(r'^\+(QENG|CREG|CGREG|CEREG|C5GREG|CPIN|COPS|CGATT|CSQ|QCAINFO):\s*(.*)$')
+
+# Registration <stat> codes; shared so every sample reuses the same strings
+REG_STATES = {
+    '0': 'NOT_REGISTERED',
+    '1': 'REGISTERED_HOME',
+    '2': 'SEARCHING',
+    '3': 'DENIED',
+    '4': 'UNKNOWN',
+    '5': 'REGISTERED_ROAMING',
+    '6': 'REGISTERED_SMS_ONLY_HOME',
+    '7': 'REGISTERED_SMS_ONLY_ROAMING',
+    '8': 'EMERGENCY_ONLY',
+    '9': 'REGISTERED_CSFB_NOT_PREFERRED_HOME',
+    '10': 'REGISTERED_CSFB_NOT_PREFERRED_ROAMING'
+}
+
+def split_fields(body: str) -> List[str]:
+    """Split a response payload into its comma-separated fields, unquoted"""
+    # One replace per line is much cheaper than strip('"') on every field
+    return body.replace('"', '').split(',')
+
+def decode_reg_state(state: str) -> str:
+    """Decode registration state"""
+    return REG_STATES.get(state, f'UNKNOWN_{state}')
+
+# LTE serving cell fields and their index in the response (before idx_offset)
+_LTE_SERVING_FIELDS = (
+    ('mcc', 3), ('mnc', 4), ('cell_id', 5), ('pci', 6), ('earfcn_arfcn', 7),
+    ('band', 8), ('bandwidth', 9), ('tac_lac', 11), ('rsrp', 12), ('rsrq', 13),
+    ('rssi', 14), ('sinr', 15), ('cqi', 16), ('tx_power', 17)
+)
+
+# Specialized LTE parsers keyed by (len(parts), idx_offset)
+_lte_serving_parsers: Dict[Tuple[int, int], Callable] = {}
+
+def _build_lte_serving_parser(num_parts: int, idx_offset: int) -> Callable:
+    """Generate a straight-line LTE parser for one response shape
+
+    The firmware's field count doesn't change within a session, so the
+    per-field length checks of the generic parser can be resolved once.
+    """
+    source = ["def parse_lte_serving_fixed(parts, data):"]
+    for name, index in _LTE_SERVING_FIELDS:
+        index += idx_offset
+        value = f"parts[{index}]" if index < num_parts else '""'
+        source.append(f"    data.{name} = {value}")
+    
+    namespace = {}
+    exec("\n".join(source), namespace)
+    return namespace["parse_lte_serving_fixed"]
+
+def parse_lte_serving(parts: List[str], data):
+    """Parse LTE serving cell data"""
+    if len(parts) < 18:
+        return
+    
+    key = (len(parts), 1 if parts[0] == 'LTE' else 0)
+    parser = _lte_serving_parsers.get(key)
+    if parser is None:
+        parser = _lte_serving_parsers[key] = _build_lte_serving_parser(*key)
+    
+    try:
+        parser(parts, data)
+    except Exception as e:
+        logger.warning(f"Specialized LTE parser failed, using generic parser: {e}")
+        _lte_serving_parsers.pop(key, None)
+        _parse_lte_serving_generic(parts, data)
+
+def _parse_lte_serving_generic(parts: List[str], data):
+    """Parse LTE serving cell data of any shape"""
+    try:
+        if len(parts) >= 18:
+            idx_offset = 1 if parts[0] == 'LTE' else 0
+            data.mcc = parts[3 + idx_offset]
+            data.mnc = parts[4 + idx_offset]
+            data.cell_id = parts[5 + idx_offset]
+            data.pci = parts[6 + idx_offset]
+            data.earfcn_arfcn = parts[7 + idx_offset]
+            data.band = parts[8 + idx_offset]
+            data.bandwidth = parts[9 + idx_offset] if len(parts) > 9 + idx_offset else ""
+            data.tac_lac = parts[11 + idx_offset]
+            data.rsrp = parts[12 + idx_offset]
+            data.rsrq = parts[13 + idx_offset]
+            data.rssi = parts[14 + idx_offset]
+            data.sinr = parts[15 + idx_offset]
+            data.cqi = parts[16 + idx_offset] if len(parts) > 16 + idx_offset else ""
+            data.tx_power = parts[17 + idx_offset] if len(parts) > 17 + idx_offset else ""
+    except (IndexError, ValueError) as e:
+        logger.warning(f"Error parsing LTE serving cell: {e}")
+
+def parse_nr5g_sa_serving(parts: List[str], data):
+    """Parse NR5G-SA serving cell data"""
+    try:
+        if len(parts) >= 17:
+            data.mcc = parts[4]
+            data.mnc = parts[5]
+            data.cell_id = parts[6]
+            data.pci = parts[7]
+            data.tac_lac = parts[8]
+            data.earfcn_arfcn = parts[9]
+            data.band = parts[10]
+            data.bandwidth = parts[11] if len(parts) > 11 else ""
+            data.rsrp = parts[12]
+            data.rsrq = parts[13]
+            data.sinr = parts[14]
+            data.rssi = parts[15] if len(parts) > 15 else ""
+            data.tx_power = parts[16] if len(parts) > 16 else ""
+    except (IndexError, ValueError) as e:
+        logger.warning(f"Error parsing NR5G-SA serving cell: {e}")
+
+def parse_nr5g_nsa_serving(parts: List[str], data):
+    """Parse NR5G-NSA serving cell data"""
+    try:
+        if len(parts) >= 11:
+            data.mcc = parts[1]
+            data.mnc = parts[2]
+            data.pci = parts[3]
+            data.rsrp = parts[4]
+            data.sinr = parts[5]
+            data.rsrq = parts[6]
+            data.earfcn_arfcn = parts[7]
+            data.band = parts[8]
+            data.bandwidth = parts[9] if len(parts) > 9 else ""
+            data.scs = parts[10] if len(parts) > 10 else ""
+    except (IndexError, ValueError) as e:
+        logger.warning(f"Error parsing NR5G-NSA serving cell: {e}")
+
+def parse_wcdma_serving(parts: List[str], data):
+    """Parse WCDMA serving cell data"""
+    try:
+        if len(parts) >= 17:
+            data.mcc = parts[4]
+            data.mnc = parts[5]
+            data.tac_lac = parts[6]
+            data.cell_id = parts[7]
+            data.earfcn_arfcn = parts[8]
+            data.pci = parts[9]  # PSC for WCDMA
+            data.rsrp = parts[11]  # RSCP for WCDMA
+            data.rsrq = parts[12]  # ECIO for WCDMA
+    except (IndexError, ValueError) as e:
+        logger.warning(f"Error parsing WCDMA serving cell: {e}")
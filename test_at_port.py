@@ -6,15 +6,16 @@ Test script to identify the AT command port for Quectel RM520N-GL
 import serial
 import time
 import glob
+from concurrent.futures import ThreadPoolExecutor
 
-def test_at_port(port, timeout=3):
-    """Test if a port responds to AT commands"""
+def test_at_port(port, timeout=0.5):
+    """Test if a port responds to AT commands within timeout seconds"""
     try:
-        # Open serial connection
+        # Open serial connection; short read timeout so we can poll for OK
         ser = serial.Serial(
             port=port,
             baudrate=115200,
-            timeout=timeout,
+            timeout=0.05,
             parity=serial.PARITY_NONE,
             stopbits=serial.STOPBITS_ONE,
             bytesize=serial.EIGHTBITS
@@ -26,10 +27,14 @@ def test_at_port(port, timeout=3):
         
         # Send AT command
         ser.write(b'AT\r\n')
-        time.sleep(0.5)
         
-        # Read response
-        response_bytes = ser.read_all()
+        # Read response, stopping as soon as the modem answers
+        response_bytes = b''
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            response_bytes += ser.read(ser.in_waiting or 1)
+            if b'OK' in response_bytes or b'ERROR' in response_bytes:
+                break
         response = response_bytes.decode('utf-8', errors='ignore') if response_bytes else ""
         
         # Clean up
@@ -57,11 +62,15 @@ def main():
     print("=" * 60)
     
     at_ports = []
+    ports = sorted(ports)
     
-    for port in sorted(ports):
-        print(f"\nTesting {port}...")
-        
-        success, response = test_at_port(port)
+    # Probe all ports at once; each worker opens its own serial connection
+    print(f"\nTesting {', '.join(ports)}...")
+    with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+        results = list(executor.map(test_at_port, ports))
+    
+    for port, (success, response) in zip(ports, results):
+        print()
         
         if success:
             print(f"✓ {port}: AT command SUCCESSFUL")